@@ -0,0 +1,127 @@
+# --- Buffered Structured Logging ---
+# Handlers log through structlog as usual, but the final logger only buffers
+# the event dict. A single background task wakes when records arrive, gives a
+# partial batch a short window to fill, and writes the batch of orjson-encoded
+# lines with one os.write, so request handlers never wait on I/O.
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+
+import orjson
+import structlog
+from opentelemetry import trace
+
+# Calls below LOG_LEVEL are compiled to no-ops by the filtering bound logger,
+# so they skip the processor chain entirely.
+LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+BUFFER_SIZE = 8192
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 0.005  # seconds
+
+# Bounded: if the writer cannot keep up the oldest records are dropped rather
+# than stalling requests.
+_buffer = deque(maxlen=BUFFER_SIZE)
+# Created per lifespan by log_writer() so it is bound to the running loop; None
+# while no writer is running (records still buffer and flush on next start).
+_batch_ready = None
+
+
+class BufferedLogger:
+    """structlog logger that hands event dicts to the writer buffer.
+
+    Must be called on the event loop thread: it wakes the writer through an
+    asyncio.Event, which is not thread-safe.
+    """
+
+    def msg(self, event_dict):
+        _buffer.append(event_dict)
+        # Wake the writer on the first buffered record and again once a full
+        # batch is waiting, so it can cut its coalescing delay short.
+        if _batch_ready is not None and len(_buffer) in (1, BATCH_SIZE):
+            _batch_ready.set()
+
+    log = debug = info = warn = warning = error = critical = exception = fatal = msg
+
+
+_LOGGER = BufferedLogger()
+
+
+def add_trace_ids(_, __, event_dict):
+    """Correlate log lines with the active span, if any."""
+    ctx = trace.get_current_span().get_span_context()
+    if ctx.is_valid:
+        event_dict["trace_id"] = format(ctx.trace_id, "032x")
+        event_dict["span_id"] = format(ctx.span_id, "016x")
+    return event_dict
+
+
+def _enqueue(_, __, event_dict):
+    # Pass the event dict through untouched; serialization happens in the
+    # writer task, off the request path.
+    return (event_dict,), {}
+
+
+structlog.configure(
+    processors=[
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.stdlib.add_log_level,
+        add_trace_ids,
+        _enqueue,
+    ],
+    wrapper_class=structlog.make_filtering_bound_logger(LOG_LEVEL),
+    logger_factory=lambda *args: _LOGGER,
+    cache_logger_on_first_use=True,
+)
+
+
+def get_logger(*args, **initial_values):
+    return structlog.get_logger(*args, **initial_values)
+
+
+def _write(buf):
+    view = memoryview(buf)
+    while view:
+        view = view[os.write(1, view) :]
+
+
+def _flush():
+    while _buffer:
+        batch = [_buffer.popleft() for _ in range(min(BATCH_SIZE, len(_buffer)))]
+        lines = [orjson.dumps(event, default=str) for event in batch]
+        _write(b"\n".join(lines) + b"\n")
+
+
+async def drain_writer(batch_ready):
+    """Flush buffered records in batches of up to BATCH_SIZE, one write per batch.
+
+    Sleeps on batch_ready while the buffer is empty, so an idle service does no
+    work. A partial batch waits at most FLUSH_INTERVAL to coalesce before it
+    is written.
+    """
+    while True:
+        await batch_ready.wait()
+        if len(_buffer) < BATCH_SIZE:
+            await asyncio.sleep(FLUSH_INTERVAL)
+        batch_ready.clear()
+        _flush()
+
+
+@asynccontextmanager
+async def log_writer():
+    """Run the drain task for the lifetime of the app, flushing on shutdown."""
+    global _batch_ready
+    _batch_ready = asyncio.Event()
+    if _buffer:
+        # Records logged before the writer started (e.g. at import time)
+        _batch_ready.set()
+    task = asyncio.create_task(drain_writer(_batch_ready))
+    try:
+        yield
+    finally:
+        _batch_ready = None
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        _flush()
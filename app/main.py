@@ -1,61 +1,114 @@
 # --- Imports ---
-from fastapi import FastAPI, Request, HTTPException
-from prometheus_client import Counter, Histogram
-from prometheus_fastapi_instrumentator import Instrumentator
-import structlog
+from fastapi import FastAPI, Request, HTTPException, Response
+from prometheus_fastapi_instrumentator import Instrumentator, metrics
+import msgspec
+import numpy as np
+import os
 import time
 import random
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from opentelemetry import trace
-from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.logging import LoggingInstrumentor
+from log import get_logger, log_writer
 
 # --- Structured Logging Setup ---
-structlog.configure(
-    processors=[
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.stdlib.add_log_level,
-        structlog.processors.JSONRenderer(),
-    ]
-)
-logger = structlog.get_logger()
+logger = get_logger()
 
 # --- FastAPI App ---
-app = FastAPI(title="FastAPI Monitoring Service", version="1.0.0")
+# Worker threads for blocking work offloaded from the event loop. Sized well
+# above asyncio's cpu_count() + 4 default so I/O-bound offloads don't queue.
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", (os.cpu_count() or 1) * 5))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="worker")
+    )
+    async with log_writer():
+        yield
 
-# --- Prometheus Metrics ---
-REQUEST_COUNT = Counter(
-    "http_requests_total", "Total HTTP requests", ["method", "endpoint", "status_code"]
-)
-REQUEST_DURATION = Histogram(
-    "http_request_duration_seconds",
-    "Request duration in seconds",
-    ["method", "endpoint"],
-)
+
+app = FastAPI(title="FastAPI Monitoring Service", version="1.0.0", lifespan=lifespan)
 
 # --- OpenTelemetry Tracing ---
 trace.set_tracer_provider(TracerProvider())
 tracer = trace.get_tracer(__name__)
 
 try:
-    jaeger_exporter = JaegerExporter(
-        agent_host_name="jaeger",
-        agent_port=14268,
+    # Jaeger accepts OTLP natively (COLLECTOR_OTLP_ENABLED)
+    otlp_exporter = OTLPSpanExporter(
+        endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://jaeger:4317"),
+        insecure=True,
+    )
+    # Larger, less frequent batches keep export overhead down under steady load
+    span_processor = BatchSpanProcessor(
+        otlp_exporter,
+        max_queue_size=4096,
+        schedule_delay_millis=10000,
+        max_export_batch_size=1024,
     )
-    span_processor = BatchSpanProcessor(jaeger_exporter)
     trace.get_tracer_provider().add_span_processor(span_processor)
     logger.info("Jaeger tracing configured successfully")
 except Exception as e:
     logger.warning("Failed to configure Jaeger", error=str(e))
 
 # --- Instrumentation ---
-FastAPIInstrumentor.instrument_app(app)
-instrumentator = Instrumentator()
+# Health probes and scrapes are the highest-volume routes and carry no useful
+# signal, so they are neither traced nor counted.
+FastAPIInstrumentor.instrument_app(app, excluded_urls="/health,/metrics")
+# Request metrics come from the instrumentator, labelled by route template
+# (handler) and grouped status class so series count stays bounded.
+instrumentator = Instrumentator(
+    should_group_status_codes=True,
+    should_instrument_requests_inprogress=False,
+    excluded_handlers=["/health", "/metrics"],
+)
+instrumentator.add(metrics.requests())
+instrumentator.add(
+    metrics.latency(buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+)
 instrumentator.instrument(app).expose(app)
-LoggingInstrumentor().instrument(set_logging_format=True)
+
+# --- Response Models ---
+# msgspec encodes these straight to JSON bytes, skipping FastAPI's
+# jsonable_encoder pass over a per-request dict.
+class ProcessingResponse(msgspec.Struct):
+    message: str
+    processing_time: float
+    endpoint: str
+
+
+class MessageResponse(msgspec.Struct):
+    message: str
+    endpoint: str
+
+
+class HealthResponse(msgspec.Struct):
+    status: str
+    timestamp: float
+    endpoint: str
+
+
+class CpuIntensiveResponse(msgspec.Struct):
+    message: str
+    iterations: int
+    result: int
+    duration: float
+    endpoint: str
+
+
+_encoder = msgspec.json.Encoder()
+
+
+def _json_response(body):
+    return Response(content=_encoder.encode(body), media_type="application/json")
+
 
 # --- Endpoints ---
 
@@ -63,47 +116,42 @@ LoggingInstrumentor().instrument(set_logging_format=True)
 @app.get("/")
 async def root():
     with tracer.start_as_current_span("root_endpoint") as span:
-        start_time = time.time()
         logger.info("Root endpoint accessed", endpoint="/", method="GET")
         # Simulate some processing time (async)
         processing_time = random.uniform(0.1, 0.5)
         await asyncio.sleep(processing_time)
-        duration = time.time() - start_time
-        REQUEST_COUNT.labels(method="GET", endpoint="/", status_code="200").inc()
-        REQUEST_DURATION.labels(method="GET", endpoint="/").observe(duration)
         span.set_attribute("processing_time", processing_time)
         span.set_attribute("endpoint", "/")
-        return {
-            "message": "Hello from monitored service!",
-            "processing_time": processing_time,
-            "endpoint": "/",
-        }
+        return _json_response(
+            ProcessingResponse(
+                message="Hello from monitored service!",
+                processing_time=processing_time,
+                endpoint="/",
+            )
+        )
 
 
 @app.get("/slow")
 async def slow_endpoint():
     with tracer.start_as_current_span("slow_endpoint") as span:
-        start_time = time.time()
         logger.info("Slow endpoint accessed", endpoint="/slow", method="GET")
         # Simulate slow processing (async)
         processing_time = random.uniform(1.0, 3.0)
         await asyncio.sleep(processing_time)
-        duration = time.time() - start_time
-        REQUEST_COUNT.labels(method="GET", endpoint="/slow", status_code="200").inc()
-        REQUEST_DURATION.labels(method="GET", endpoint="/slow").observe(duration)
         span.set_attribute("processing_time", processing_time)
         span.set_attribute("endpoint", "/slow")
-        return {
-            "message": "This was a slow operation",
-            "processing_time": processing_time,
-            "endpoint": "/slow",
-        }
+        return _json_response(
+            ProcessingResponse(
+                message="This was a slow operation",
+                processing_time=processing_time,
+                endpoint="/slow",
+            )
+        )
 
 
 @app.get("/error")
 async def error_endpoint():
     with tracer.start_as_current_span("error_endpoint") as span:
-        start_time = time.time()
         will_error = random.random() < 0.7  # 70% chance of error
         if will_error:
             logger.error(
@@ -112,12 +160,6 @@ async def error_endpoint():
                 method="GET",
                 will_error=True,
             )
-            REQUEST_COUNT.labels(
-                method="GET", endpoint="/error", status_code="500"
-            ).inc()
-            REQUEST_DURATION.labels(method="GET", endpoint="/error").observe(
-                time.time() - start_time
-            )
             span.set_attribute("error", True)
             span.set_attribute("endpoint", "/error")
             raise HTTPException(status_code=500, detail="Simulated server error")
@@ -128,55 +170,62 @@ async def error_endpoint():
                 method="GET",
                 will_error=False,
             )
-            REQUEST_COUNT.labels(
-                method="GET", endpoint="/error", status_code="200"
-            ).inc()
-            REQUEST_DURATION.labels(method="GET", endpoint="/error").observe(
-                time.time() - start_time
-            )
             span.set_attribute("error", False)
             span.set_attribute("endpoint", "/error")
-            return {"message": "No error this time!", "endpoint": "/error"}
+            return _json_response(
+                MessageResponse(message="No error this time!", endpoint="/error")
+            )
 
 
 @app.get("/health")
 async def health_check():
-    with tracer.start_as_current_span("health_check") as span:
-        start_time = time.time()
-        logger.info("Health check performed", endpoint="/health", method="GET")
-        REQUEST_COUNT.labels(method="GET", endpoint="/health", status_code="200").inc()
-        REQUEST_DURATION.labels(method="GET", endpoint="/health").observe(
-            time.time() - start_time
-        )
-        span.set_attribute("endpoint", "/health")
-        return {"status": "healthy", "timestamp": time.time(), "endpoint": "/health"}
+    logger.debug("Health check performed", endpoint="/health", method="GET")
+    return _json_response(
+        HealthResponse(status="healthy", timestamp=time.time(), endpoint="/health")
+    )
+
+
+# Set SIMULATE_CPU_LOAD=true to actually burn CPU in /cpu-intensive; otherwise
+# the sum of squares is computed in closed form.
+SIMULATE_CPU_LOAD = os.getenv("SIMULATE_CPU_LOAD", "false").lower() == "true"
+
+
+def _sum_squares_closed_form(iterations):
+    """Sum of i*i for i in range(iterations), in O(1)."""
+    return (iterations - 1) * iterations * (2 * iterations - 1) // 6
+
+
+def _sum_squares_numpy(iterations):
+    """Sum of i*i for i in range(iterations), doing the actual O(n) work."""
+    return int(np.square(np.arange(iterations, dtype=np.int64)).sum())
 
 
 # Additional endpoint for more interesting metrics
 @app.get("/cpu-intensive")
 async def cpu_intensive():
     with tracer.start_as_current_span("cpu_intensive") as span:
-        start_time = time.time()
+        start_time = time.perf_counter()
         logger.info(
             "CPU intensive endpoint accessed", endpoint="/cpu-intensive", method="GET"
         )
-        # Simulate CPU-intensive work
+        # Simulate CPU-intensive work: sum of i*i for i in range(iterations)
         iterations = random.randint(100000, 500000)
-        result = sum(i * i for i in range(iterations))
-        duration = time.time() - start_time
-        REQUEST_COUNT.labels(
-            method="GET", endpoint="/cpu-intensive", status_code="200"
-        ).inc()
-        REQUEST_DURATION.labels(method="GET", endpoint="/cpu-intensive").observe(
-            duration
-        )
+        if SIMULATE_CPU_LOAD:
+            # Run the real workload on a worker thread so the event loop keeps
+            # serving other requests meanwhile.
+            result = await asyncio.to_thread(_sum_squares_numpy, iterations)
+        else:
+            result = _sum_squares_closed_form(iterations)
+        duration = time.perf_counter() - start_time
         span.set_attribute("iterations", iterations)
         span.set_attribute("duration", duration)
         span.set_attribute("endpoint", "/cpu-intensive")
-        return {
-            "message": "CPU intensive operation completed",
-            "iterations": iterations,
-            "result": result,
-            "duration": duration,
-            "endpoint": "/cpu-intensive",
-        }
+        return _json_response(
+            CpuIntensiveResponse(
+                message="CPU intensive operation completed",
+                iterations=iterations,
+                result=result,
+                duration=duration,
+                endpoint="/cpu-intensive",
+            )
+        )
@@ -1,11 +1,18 @@
-import requests
+import aiohttp
+import asyncio
 import time
 import random
-import threading
-from concurrent.futures import ThreadPoolExecutor
+import bisect
 import sys
+import queue
+import threading
+from contextlib import suppress
+from itertools import accumulate
 
 BASE_URL = "http://localhost:8000"
+# Status emoji indexed by (status < 400)
+EMOJI = ("❌", "✅")
+CHECK_TIMEOUT = aiohttp.ClientTimeout(total=5)
 
 endpoints = [
     "/",
@@ -15,6 +22,25 @@ endpoints = [
     "/cpu-intensive"
 ]
 
+# Output is queued and written by a single thread in batches, so request
+# coroutines never block on stdout
+LOG_Q = queue.SimpleQueue()
+LOG_BATCH = 64
+
+def emit(line):
+    LOG_Q.put_nowait(f"{line}\n")
+
+def log_writer():
+    """Drain queued output until the None sentinel arrives"""
+    while True:
+        batch = [LOG_Q.get()]
+        while len(batch) < LOG_BATCH and not LOG_Q.empty():
+            batch.append(LOG_Q.get_nowait())
+        sys.stdout.write("".join(line for line in batch if line is not None))
+        sys.stdout.flush()
+        if None in batch:
+            return
+
 # Weight different endpoints to create realistic traffic patterns
 endpoint_weights = {
     "/": 0.4,           # Most common - root endpoint
@@ -24,128 +50,154 @@ endpoint_weights = {
     "/cpu-intensive": 0.1  # CPU intensive operations
 }
 
-def weighted_choice(choices):
+# Precomputed once so each pick is a single bisect over cumulative weights
+_POP = list(endpoint_weights)
+_CUM = list(accumulate(endpoint_weights.values()))
+_TOTAL = _CUM[-1]
+_LAST = len(_CUM) - 1
+
+def weighted_choice():
     """Choose endpoint based on weights"""
-    total = sum(choices.values())
-    r = random.uniform(0, total)
-    upto = 0
-    for choice, weight in choices.items():
-        if upto + weight >= r:
-            return choice
-        upto += weight
-    return list(choices.keys())[-1]
-
-def make_request():
-    endpoint = weighted_choice(endpoint_weights)
+    # Same selection as random.choices(k=1) without its per-call setup
+    return _POP[bisect.bisect(_CUM, random.random() * _TOTAL, 0, _LAST)]
+
+async def make_request(session, endpoint=None):
+    if endpoint is None:
+        endpoint = weighted_choice()
     try:
-        start_time = time.time()
-        response = requests.get(f"{BASE_URL}{endpoint}", timeout=10)
-        duration = time.time() - start_time
+        start_time = time.perf_counter()
+        async with session.get(f"{BASE_URL}{endpoint}") as response:
+            await response.read()
+        duration = time.perf_counter() - start_time
         
-        status_emoji = "✅" if response.status_code < 400 else "❌"
-        print(f"{status_emoji} GET {endpoint} - Status: {response.status_code} - Duration: {duration:.3f}s")
+        emit(f"{EMOJI[response.status < 400]} GET {endpoint} - Status: {response.status} - Duration: {duration:.3f}s")
         
-        return response.status_code, duration
-    except requests.exceptions.Timeout:
-        print(f"⏰ GET {endpoint} - TIMEOUT")
+        return response.status, duration
+    except asyncio.TimeoutError:
+        emit(f"⏰ GET {endpoint} - TIMEOUT")
         return 408, 10.0
     except Exception as e:
-        print(f"💥 GET {endpoint} - ERROR: {e}")
+        emit(f"💥 GET {endpoint} - ERROR: {e}")
         return 500, 0.0
 
-def generate_burst_traffic():
+async def generate_burst_traffic(session):
     """Generate burst traffic to simulate real-world patterns"""
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(make_request) for _ in range(20)]
-        for future in futures:
-            try:
-                future.result(timeout=15)
-            except Exception as e:
-                print(f"Request failed: {e}")
-
-def generate_steady_traffic(duration=300, requests_per_minute=30):
+    # Draw the whole burst's endpoints in one call
+    endpoints_batch = random.choices(_POP, cum_weights=_CUM, k=20)
+    results = await asyncio.gather(
+        *(make_request(session, endpoint) for endpoint in endpoints_batch),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            emit(f"Request failed: {result}")
+
+async def generate_steady_traffic(session, duration=300, requests_per_minute=30):
     """Generate steady background traffic"""
-    start_time = time.time()
-    request_count = 0
+    interval = 60 / requests_per_minute
+    start_time = time.perf_counter()
+    next_time = start_time
     
-    print(f"🚀 Starting steady traffic generation for {duration}s at {requests_per_minute} req/min")
+    emit(f"🚀 Starting steady traffic generation for {duration}s at {requests_per_minute} req/min")
     
-    while time.time() - start_time < duration:
-        make_request()
-        request_count += 1
-        
-        # Calculate sleep time to maintain desired rate
-        elapsed = time.time() - start_time
-        expected_requests = (elapsed / 60) * requests_per_minute
-        
-        if request_count > expected_requests:
-            sleep_time = (request_count - expected_requests) * (60 / requests_per_minute)
-            time.sleep(sleep_time)
+    while time.perf_counter() - start_time < duration:
+        await make_request(session)
         
-        # Add some randomness to avoid perfectly regular patterns
-        time.sleep(random.uniform(0.5, 2.0))
+        # Sleep until the next slot on a fixed schedule so the rate doesn't drift
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif -delay > interval:
+            # Slow responses put us more than a slot behind; warn and resync
+            # instead of firing a catch-up burst
+            emit(f"⚠️ Steady traffic {-delay:.1f}s behind target rate of {requests_per_minute} req/min")
+            next_time = time.perf_counter()
 
-def generate_mixed_traffic(duration=180):
+async def generate_mixed_traffic(session, duration=180):
     """Generate mixed traffic patterns"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
-    print(f"🎯 Starting mixed traffic generation for {duration}s")
-    print("This includes:")
-    print("- Steady background traffic")
-    print("- Periodic burst traffic")
-    print("- Random spikes")
+    emit(f"🎯 Starting mixed traffic generation for {duration}s")
+    emit("This includes:")
+    emit("- Steady background traffic")
+    emit("- Periodic burst traffic")
+    emit("- Random spikes")
     
     # Start background steady traffic
-    steady_thread = threading.Thread(
-        target=generate_steady_traffic, 
-        args=(duration, 20)
-    )
-    steady_thread.daemon = True
-    steady_thread.start()
+    steady_task = asyncio.create_task(generate_steady_traffic(session, duration, 20))
     
     # Generate periodic bursts
-    while time.time() - start_time < duration:
+    while time.perf_counter() - start_time < duration:
         # Wait for next burst
-        time.sleep(random.uniform(15, 30))
+        await asyncio.sleep(random.uniform(15, 30))
         
-        if time.time() - start_time < duration:
-            print("💥 Generating traffic burst...")
-            generate_burst_traffic()
+        if time.perf_counter() - start_time < duration:
+            emit("💥 Generating traffic burst...")
+            await generate_burst_traffic(session)
+    
+    steady_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await steady_task
     
-    print("✨ Traffic generation completed!")
+    emit("✨ Traffic generation completed!")
 
-def test_endpoints():
+async def test_endpoints(session):
     """Test all endpoints to ensure they're working"""
-    print("🔍 Testing all endpoints...")
+    emit("🔍 Testing all endpoints...")
     
     for endpoint in endpoints:
         try:
-            response = requests.get(f"{BASE_URL}{endpoint}", timeout=5)
-            status_emoji = "✅" if response.status_code < 400 else "❌"
-            print(f"{status_emoji} {endpoint} - Status: {response.status_code}")
+            async with session.get(f"{BASE_URL}{endpoint}", timeout=CHECK_TIMEOUT) as response:
+                emit(f"{EMOJI[response.status < 400]} {endpoint} - Status: {response.status}")
         except Exception as e:
-            print(f"❌ {endpoint} - Error: {e}")
+            emit(f"❌ {endpoint} - Error: {e}")
     
-    print()
+    emit("")
 
-if __name__ == "__main__":
-    # Check if service is available
+async def check_service(session):
+    """Return whether the service is healthy, or None if it cannot be reached"""
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=5)
-        if response.status_code != 200:
-            print("❌ Service not healthy. Please start the FastAPI service first.")
+        async with session.get(f"{BASE_URL}/health", timeout=CHECK_TIMEOUT) as response:
+            return response.status == 200
+    except Exception:
+        return None
+
+def create_session():
+    """Create the session shared by every request"""
+    # Keep-alive sockets are reused across the health check, endpoint tests
+    # and all generated traffic
+    connector = aiohttp.TCPConnector(limit=100, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=10)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def main(duration):
+    async with create_session() as session:
+        # Check if service is available
+        healthy = await check_service(session)
+        if healthy is None:
+            emit(f"❌ Cannot connect to service at {BASE_URL}")
+            emit("Please ensure the FastAPI service is running with: docker-compose up -d")
             sys.exit(1)
-    except Exception as e:
-        print(f"❌ Cannot connect to service at {BASE_URL}")
-        print("Please ensure the FastAPI service is running with: docker-compose up -d")
-        sys.exit(1)
-    
-    print("🌟 FastAPI Monitoring Traffic Generator")
-    print("=" * 50)
-    
-    # Test all endpoints first
-    test_endpoints()
-    
+        if not healthy:
+            emit("❌ Service not healthy. Please start the FastAPI service first.")
+            sys.exit(1)
+        
+        emit("🌟 FastAPI Monitoring Traffic Generator")
+        emit("=" * 50)
+        
+        # Test all endpoints first
+        await test_endpoints(session)
+        
+        await generate_mixed_traffic(session, duration)
+
+if __name__ == "__main__":
     # Generate traffic based on command line argument or default
     duration = int(sys.argv[1]) if len(sys.argv) > 1 else 180
-    generate_mixed_traffic(duration)
\ No newline at end of file
+    writer = threading.Thread(target=log_writer, daemon=True)
+    writer.start()
+    try:
+        asyncio.run(main(duration))
+    finally:
+        LOG_Q.put(None)
+        writer.join()
\ No newline at end of file